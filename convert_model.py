@@ -0,0 +1,53 @@
+"""Convert the Keras parking spot model to a quantized TFLite model.
+
+Usage: python convert_model.py [sample_images_dir]
+
+The sample images directory should contain a few hundred real parking spot
+crops; they are used to calibrate the int8 activation ranges. They go through
+the same preprocessing as the app, so the input quantization matches what it
+feeds the model.
+
+The app runs the converted model on TFLite's default XNNPACK CPU kernels. Set
+the TFLITE_DELEGATE environment variable to a delegate library to use that
+instead, e.g. TFLITE_DELEGATE=libedgetpu.so.1 on Coral hardware.
+"""
+import os
+import sys
+import cv2
+import tensorflow as tf
+from preprocessing import preprocess_image
+
+KERAS_MODEL_PATH = 'parking_model.h5'
+TFLITE_MODEL_PATH = 'parking_model.tflite'
+NUM_CALIBRATION_SAMPLES = 100
+
+def representative_dataset(images_dir):
+    """Yield preprocessed sample images for int8 calibration"""
+    files = sorted(
+        f for f in os.listdir(images_dir)
+        if f.lower().endswith((".jpg", ".jpeg", ".png"))
+    )[:NUM_CALIBRATION_SAMPLES]
+    for filename in files:
+        img = cv2.imread(os.path.join(images_dir, filename), cv2.IMREAD_COLOR)
+        if img is not None:
+            yield [preprocess_image(img)]
+
+def convert(images_dir):
+    """Convert the Keras model with post-training int8 quantization"""
+    keras_model = tf.keras.models.load_model(KERAS_MODEL_PATH)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: representative_dataset(images_dir)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    # Quantize the model inputs and outputs too, so inference is int8 end to end
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    tflite_model = converter.convert()
+
+    with open(TFLITE_MODEL_PATH, "wb") as f:
+        f.write(tflite_model)
+    print(f"Wrote {TFLITE_MODEL_PATH} ({len(tflite_model) / 1024:.1f} KB)")
+
+if __name__ == "__main__":
+    convert(sys.argv[1] if len(sys.argv) > 1 else "sample_images")
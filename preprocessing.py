@@ -0,0 +1,14 @@
+"""Image preprocessing shared by the app and the model conversion script."""
+import cv2
+import numpy as np
+
+# Model input size (width, height)
+IMG_SIZE = (180, 180)
+
+def preprocess_image(img):
+    """Convert a BGR image into a float32 model input batch"""
+    # Resize first so the remaining work only touches 180x180 pixels
+    img = cv2.resize(img, IMG_SIZE, interpolation=cv2.INTER_LINEAR)
+    # BGR->RGB flip and float32 cast in a single pass into contiguous memory.
+    # The model rescales pixels itself, so feed raw 0-255 values
+    return np.ascontiguousarray(img[..., ::-1], dtype=np.float32)[None, ...]
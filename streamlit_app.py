@@ -1,111 +1,190 @@
 import streamlit as st
-import random
 import time
+import math
 from datetime import datetime
+from urllib.parse import urlencode
 import pandas as pd
 import plotly.express as px
 import sqlite3
 from sqlite3 import Error
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.preprocessing import image
 import os
+import cv2
+import threading
 from PIL import Image
 import matplotlib.pyplot as plt
+from preprocessing import preprocess_image
+
+# Database Setup
+@st.cache_resource
+def get_conn():
+    """Open the shared database connection, reused across reruns and sessions"""
+    conn = sqlite3.connect('parking.db', check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-20000')
+    return conn
+
+@st.cache_resource
+def get_db_lock():
+    """Lock serializing use of the shared connection across sessions"""
+    return threading.Lock()
 
-# Database Setup (unchanged)
 def create_connection():
-    """Create a database connection"""
-    conn = None
+    """Get the shared database connection"""
     try:
-        conn = sqlite3.connect('parking.db')
-        return conn
+        return get_conn()
     except Error as e:
         st.error(f"Database connection error: {e}")
-    return conn
+    return None
 
 def initialize_database():
     """Initialize database tables"""
     conn = create_connection()
     if conn is not None:
-        try:
-            c = conn.cursor()
-            # Create parking_lots table
-            c.execute('''
-                CREATE TABLE IF NOT EXISTS parking_lots (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    capacity INTEGER NOT NULL,
-                    rate TEXT NOT NULL,
-                    location TEXT NOT NULL,
-                    latitude REAL NOT NULL,
-                    longitude REAL NOT NULL,
-                    special_info TEXT
-                )
-            ''')
-            
-            # Create parking_status table
-            c.execute('''
-                CREATE TABLE IF NOT EXISTS parking_status (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    lot_id INTEGER NOT NULL,
-                    occupied INTEGER NOT NULL,
-                    last_updated TIMESTAMP NOT NULL,
-                    FOREIGN KEY (lot_id) REFERENCES parking_lots (id)
-                )
-            ''')
-            
-            # Create reservations table
-            c.execute('''
-                CREATE TABLE IF NOT EXISTS reservations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    lot_id INTEGER NOT NULL,
-                    permit_type TEXT NOT NULL,
-                    license_plate TEXT NOT NULL,
-                    arrival_time TEXT NOT NULL,
-                    reservation_time TIMESTAMP NOT NULL,
-                    user_id TEXT,
-                    FOREIGN KEY (lot_id) REFERENCES parking_lots (id)
-                )
-            ''')
-            conn.commit()
-        except Error as e:
-            st.error(f"Database initialization error: {e}")
-        finally:
-            conn.close()
+        with get_db_lock():
+            try:
+                c = conn.cursor()
+                # Create parking_lots table
+                c.execute('''
+                    CREATE TABLE IF NOT EXISTS parking_lots (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL,
+                        capacity INTEGER NOT NULL,
+                        rate TEXT NOT NULL,
+                        location TEXT NOT NULL,
+                        latitude REAL NOT NULL,
+                        longitude REAL NOT NULL,
+                        special_info TEXT
+                    )
+                ''')
+                
+                # Create parking_status table
+                c.execute('''
+                    CREATE TABLE IF NOT EXISTS parking_status (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        lot_id INTEGER NOT NULL,
+                        occupied INTEGER NOT NULL,
+                        last_updated TIMESTAMP NOT NULL,
+                        FOREIGN KEY (lot_id) REFERENCES parking_lots (id)
+                    )
+                ''')
+                
+                # One status row per lot. Databases from older versions lack the unique
+                # index and may hold duplicates, so drop those once before creating it
+                c.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_parking_status_lot'")
+                if c.fetchone() is None:
+                    c.execute('''
+                        DELETE FROM parking_status
+                        WHERE id NOT IN (SELECT MAX(id) FROM parking_status GROUP BY lot_id)
+                    ''')
+                    c.execute('''
+                        CREATE UNIQUE INDEX idx_parking_status_lot
+                        ON parking_status (lot_id)
+                    ''')
+                
+                # Create reservations table
+                c.execute('''
+                    CREATE TABLE IF NOT EXISTS reservations (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        lot_id INTEGER NOT NULL,
+                        permit_type TEXT NOT NULL,
+                        license_plate TEXT NOT NULL,
+                        arrival_time TEXT NOT NULL,
+                        reservation_time TIMESTAMP NOT NULL,
+                        user_id TEXT,
+                        FOREIGN KEY (lot_id) REFERENCES parking_lots (id)
+                    )
+                ''')
+                
+                # Indexes for reservation lookups by lot and the name-ordered lot listing
+                c.execute('CREATE INDEX IF NOT EXISTS idx_res_lot ON reservations (lot_id)')
+                c.execute('CREATE INDEX IF NOT EXISTS idx_lot_name ON parking_lots (name)')
+                conn.commit()
+            except Error as e:
+                conn.rollback()
+                st.error(f"Database initialization error: {e}")
 
 # Initialize the database
 initialize_database()
 
-# Load the parking spot detection model (from the Jupyter notebook)
+# Load the parking spot detection model (quantized TFLite, see convert_model.py)
 @st.cache_resource
 def load_model():
-    try:
-        # Load the pre-trained model (in a real app, you would load your actual trained model)
-        model = tf.keras.models.load_model('parking_model.h5')  # Replace with your model path
-        return model
-    except Exception as e:
-        st.error(f"Error loading model: {e}")
-        return None
+    """Build the shared TFLite interpreter; errors propagate so failures aren't cached"""
+    # Import TensorFlow here so its multi-second import is only paid once an
+    # image is classified; silence its C++ startup logging before it loads
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+    import tensorflow as tf
+    
+    # XNNPACK is used by default on x86/ARM; set TFLITE_DELEGATE to load another
+    # delegate library instead (e.g. libedgetpu.so.1 on Coral hardware)
+    delegate = os.environ.get('TFLITE_DELEGATE')
+    delegates = [tf.lite.experimental.load_delegate(delegate)] if delegate else None
+    # Loading by path lets TFLite mmap the FlatBuffer read-only, so the weights
+    # stay in shared page cache rather than being copied onto the heap
+    interpreter = tf.lite.Interpreter(model_path='parking_model.tflite',
+                                      num_threads=os.cpu_count(),
+                                      experimental_delegates=delegates)
+    interpreter.allocate_tensors()
+    # Cache tensor details so they aren't re-queried on every classification
+    interpreter.input_details = interpreter.get_input_details()[0]
+    interpreter.output_details = interpreter.get_output_details()[0]
+    # The one cached interpreter serves every session, but invoke() isn't thread-safe
+    interpreter.lock = threading.Lock()
+    # Warm up with a dummy input so the first real classification isn't slowed down
+    input_details = interpreter.input_details
+    interpreter.set_tensor(input_details['index'], np.zeros(input_details['shape'], dtype=input_details['dtype']))
+    interpreter.invoke()
+    return interpreter
 
-model = load_model()
+def classify_image(img, model):
+    """Classify a decoded BGR image as an occupied or empty spot"""
+    if img is None:
+        raise ValueError("Could not decode image")
+    img_array = preprocess_image(img)
+    
+    # Quantize the input in place if the model takes integer values
+    input_details = model.input_details
+    if input_details['dtype'] != np.float32:
+        scale, zero_point = input_details['quantization']
+        info = np.iinfo(input_details['dtype'])
+        img_array /= scale
+        img_array += zero_point
+        np.rint(img_array, out=img_array)
+        np.clip(img_array, info.min, info.max, out=img_array)
+        img_array = img_array.astype(input_details['dtype'])
+    
+    with model.lock:
+        model.set_tensor(input_details['index'], img_array)
+        model.invoke()
+        output = model.get_tensor(model.output_details['index'])
+    
+    # Dequantize the output if the model produces quantized values
+    scale, zero_point = model.output_details['quantization']
+    if scale:
+        output = (output.astype(np.float32) - zero_point) * scale
+    score = output[0][0]
+    
+    # Assuming binary classification: 0=Empty, 1=Occupied
+    return "Occupied" if score > 0.5 else "Empty", float(score)
 
-# Function to classify parking spots (from the Jupyter notebook)
-def classify_parking_spot(img_path, model):
-    """Classify if a parking spot is occupied or empty"""
+# Function to classify uploaded parking spot images
+@st.cache_data(show_spinner=False, max_entries=64)
+def _classify_bytes(data):
+    """Classify an encoded image held in memory (e.g. an upload), cached by content"""
+    arr = np.frombuffer(data, np.uint8)
+    return classify_image(cv2.imdecode(arr, cv2.IMREAD_COLOR), load_model())
+
+def classify_upload(uploaded_file):
+    """Classify an uploaded image, returning None (after reporting) on failure"""
     try:
-        img = image.load_img(img_path, target_size=(180, 180))
-        img_array = image.img_to_array(img)
-        img_array = np.expand_dims(img_array, axis=0)
-        
-        predictions = model.predict(img_array)
-        score = predictions[0][0]
-        
-        # Assuming binary classification: 0=Empty, 1=Occupied
-        return "Occupied" if score > 0.5 else "Empty", float(score)
+        return _classify_bytes(uploaded_file.getvalue())
     except Exception as e:
+        # st.cache_data doesn't cache exceptions, so re-uploading retries
         st.error(f"Error classifying image: {e}")
-        return "Error", 0.0
+        return None
 
 # App Configuration
 st.set_page_config(
@@ -115,153 +194,187 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Database Operations (unchanged)
+# Database Operations
+# SQL used by the helpers below, kept in one place so shared statements aren't duplicated
+_STMT_GET_LOTS = '''
+    SELECT 
+        pl.id, pl.name, pl.capacity, pl.rate, pl.location, 
+        pl.latitude, pl.longitude, pl.special_info,
+        ps.occupied, ps.last_updated
+    FROM parking_lots pl
+    LEFT JOIN parking_status ps ON pl.id = ps.lot_id
+    ORDER BY pl.name
+'''
+
+_STMT_UPSERT_STATUS = '''
+    INSERT INTO parking_status (lot_id, occupied, last_updated)
+    VALUES (?, ?, ?)
+    ON CONFLICT (lot_id) DO UPDATE SET
+        occupied = excluded.occupied,
+        last_updated = excluded.last_updated
+'''
+
+_STMT_INS_RESERVATION = '''
+    INSERT INTO reservations 
+    (lot_id, permit_type, license_plate, arrival_time, reservation_time, user_id)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+_STMT_INC_OCCUPIED = '''
+    UPDATE parking_status 
+    SET occupied = occupied + 1 
+    WHERE lot_id = ?
+'''
+
+_STMT_LOT_UTILIZATION = '''
+    SELECT 
+        pl.name, pl.capacity, COALESCE(ps.occupied, 0),
+        COALESCE(ps.occupied, 0) * 100.0 / pl.capacity
+    FROM parking_lots pl
+    LEFT JOIN parking_status ps ON pl.id = ps.lot_id
+    ORDER BY pl.name
+'''
+
+_STMT_CAMPUS_TOTALS = '''
+    SELECT SUM(pl.capacity), SUM(COALESCE(ps.occupied, 0))
+    FROM parking_lots pl
+    LEFT JOIN parking_status ps ON pl.id = ps.lot_id
+'''
+
+@st.cache_data(ttl=5, show_spinner=False)
 def get_parking_lots():
     """Get all parking lots from database"""
     conn = create_connection()
     if conn is not None:
-        try:
-            c = conn.cursor()
-            c.execute('''
-                SELECT 
-                    pl.id, pl.name, pl.capacity, pl.rate, pl.location, 
-                    pl.latitude, pl.longitude, pl.special_info,
-                    ps.occupied, ps.last_updated
-                FROM parking_lots pl
-                LEFT JOIN parking_status ps ON pl.id = ps.lot_id
-                ORDER BY pl.name
-            ''')
-            rows = c.fetchall()
-            return [{
-                'id': row[0],
-                'name': row[1],
-                'capacity': row[2],
-                'rate': row[3],
-                'location': row[4],
-                'coords': (row[5], row[6]),
-                'special': row[7],
-                'occupied': row[8] if row[8] is not None else 0,
-                'last_updated': row[9] if row[9] is not None else datetime.now()
-            } for row in rows]
-        except Error as e:
-            st.error(f"Error fetching parking lots: {e}")
-            return []
-        finally:
-            conn.close()
+        with get_db_lock():
+            try:
+                c = conn.cursor()
+                c.execute(_STMT_GET_LOTS)
+                rows = c.fetchall()
+                return [{
+                    'id': row[0],
+                    'name': row[1],
+                    'capacity': row[2],
+                    'rate': row[3],
+                    'location': row[4],
+                    'coords': (row[5], row[6]),
+                    'special': row[7],
+                    'occupied': row[8] if row[8] is not None else 0,
+                    'last_updated': row[9] if row[9] is not None else datetime.now()
+                } for row in rows]
+            except Error as e:
+                st.error(f"Error fetching parking lots: {e}")
+                return []
     return []
 
 def update_parking_status(lot_id, occupied):
     """Update parking status in database"""
     conn = create_connection()
     if conn is not None:
-        try:
-            c = conn.cursor()
-            # Check if record exists
-            c.execute('SELECT id FROM parking_status WHERE lot_id = ?', (lot_id,))
-            if c.fetchone():
-                c.execute('''
-                    UPDATE parking_status 
-                    SET occupied = ?, last_updated = ?
-                    WHERE lot_id = ?
-                ''', (occupied, datetime.now(), lot_id))
-            else:
-                c.execute('''
-                    INSERT INTO parking_status (lot_id, occupied, last_updated)
-                    VALUES (?, ?, ?)
-                ''', (lot_id, occupied, datetime.now()))
-            conn.commit()
-            return True
-        except Error as e:
-            st.error(f"Error updating parking status: {e}")
-            return False
-        finally:
-            conn.close()
+        with get_db_lock():
+            try:
+                c = conn.cursor()
+                c.execute(_STMT_UPSERT_STATUS, (lot_id, occupied, datetime.now()))
+                conn.commit()
+                get_parking_lots.clear()
+                get_analytics.clear()
+                return True
+            except Error as e:
+                conn.rollback()
+                st.error(f"Error updating parking status: {e}")
+                return False
     return False
 
 def add_reservation(lot_id, permit_type, license_plate, arrival_time, user_id="guest"):
     """Add a new reservation to database"""
     conn = create_connection()
     if conn is not None:
-        try:
-            c = conn.cursor()
-            c.execute('''
-                INSERT INTO reservations 
-                (lot_id, permit_type, license_plate, arrival_time, reservation_time, user_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (lot_id, permit_type, license_plate, arrival_time, datetime.now(), user_id))
-            
-            # Update occupied count
-            c.execute('''
-                UPDATE parking_status 
-                SET occupied = occupied + 1 
-                WHERE lot_id = ?
-            ''', (lot_id,))
-            
-            conn.commit()
-            return True
-        except Error as e:
-            st.error(f"Error creating reservation: {e}")
-            return False
-        finally:
-            conn.close()
+        with get_db_lock():
+            try:
+                c = conn.cursor()
+                c.execute(_STMT_INS_RESERVATION,
+                          (lot_id, permit_type, license_plate, arrival_time, datetime.now(), user_id))
+                
+                # Update occupied count
+                c.execute(_STMT_INC_OCCUPIED, (lot_id,))
+                
+                conn.commit()
+                get_parking_lots.clear()
+                get_analytics.clear()
+                return True
+            except Error as e:
+                conn.rollback()
+                st.error(f"Error creating reservation: {e}")
+                return False
     return False
 
+@st.cache_data(ttl=10, show_spinner=False)
+def get_analytics():
+    """Get per-lot utilization and campus totals from database"""
+    columns = ["Lot", "Capacity", "Occupied", "Utilization"]
+    conn = create_connection()
+    if conn is not None:
+        with get_db_lock():
+            try:
+                c = conn.cursor()
+                c.execute(_STMT_LOT_UTILIZATION)
+                df = pd.DataFrame(c.fetchall(), columns=columns)
+                
+                c.execute(_STMT_CAMPUS_TOTALS)
+                total_capacity, total_occupied = c.fetchone()
+                return df, total_capacity or 0, total_occupied or 0
+            except Error as e:
+                st.error(f"Error fetching analytics: {e}")
+    return pd.DataFrame(columns=columns), 0, 0
+
 # Initialize sample data if database is empty
 def initialize_sample_data():
     """Insert sample data if database is empty"""
     conn = create_connection()
     if conn is not None:
-        try:
-            c = conn.cursor()
-            c.execute('SELECT COUNT(*) FROM parking_lots')
-            if c.fetchone()[0] == 0:
-                sample_lots = [
-                    ("Great Hall", 31, "0.70/hr", "Near Main Entrance", 37.7749, -122.4194, "Visitor Parking"),
-                    ("Faculty of Science", 200, "1.00/hr", "MLT and SLT Buildings", 37.7755, -122.4180, "Students/Lecturers"),
-                    ("Student Union Lot", 40, "1.00/hr", "Next to Student Center", 37.7735, -122.4210, "Student Permits"),
-                    ("Athletics Field Parking", 150, "1.50/hr", "Near Sports Complex", 37.7760, -122.4200, "Event Parking")
-                ]
-                c.executemany('''
-                    INSERT INTO parking_lots 
-                    (name, capacity, rate, location, latitude, longitude, special_info)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', sample_lots)
+        with get_db_lock():
+            try:
+                c = conn.cursor()
+                c.execute('SELECT COUNT(*) FROM parking_lots')
+                if c.fetchone()[0] == 0:
+                    sample_lots = [
+                        ("Great Hall", 31, "0.70/hr", "Near Main Entrance", 37.7749, -122.4194, "Visitor Parking"),
+                        ("Faculty of Science", 200, "1.00/hr", "MLT and SLT Buildings", 37.7755, -122.4180, "Students/Lecturers"),
+                        ("Student Union Lot", 40, "1.00/hr", "Next to Student Center", 37.7735, -122.4210, "Student Permits"),
+                        ("Athletics Field Parking", 150, "1.50/hr", "Near Sports Complex", 37.7760, -122.4200, "Event Parking")
+                    ]
+                    c.executemany('''
+                        INSERT INTO parking_lots 
+                        (name, capacity, rate, location, latitude, longitude, special_info)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', sample_lots)
                 
-                # Initialize random occupied counts
-                c.execute('SELECT id FROM parking_lots')
-                for lot_id in c.fetchall():
-                    occupied = random.randint(int(lot_id[0]*10), int(lot_id[0]*20))
-                    update_parking_status(lot_id[0], occupied)
+                    # Initialize random occupied counts, never above a lot's capacity
+                    c.execute('SELECT id, capacity FROM parking_lots')
+                    ids, capacities = np.array(c.fetchall()).T
+                    occupied = np.minimum(np.random.randint(ids*10, ids*20 + 1), capacities)
+                    rows = list(zip(ids.tolist(), occupied.tolist(), [datetime.now()]*len(ids)))
+                    c.executemany(_STMT_UPSERT_STATUS, rows)
                 
-                conn.commit()
-        except Error as e:
-            st.error(f"Error initializing sample data: {e}")
-        finally:
-            conn.close()
+                    conn.commit()
+            except Error as e:
+                conn.rollback()
+                st.error(f"Error initializing sample data: {e}")
 
 # Initialize sample data if needed
 initialize_sample_data()
 
 # UI Components (updated with parking spot detection)
-def show_parking_map():
-    """Interactive campus parking map"""
-    parking_data = get_parking_lots()
-    map_data = []
-    for lot in parking_data:
-        available = lot['capacity'] - lot['occupied']
-        map_data.append({
-            "Lot": lot['name'],
-            "Latitude": lot['coords'][0],
-            "Longitude": lot['coords'][1],
-            "Available": available,
-            "Capacity": lot['capacity'],
-            "Rate": lot['rate'],
-            "Status": "🟢 Good" if available > 20 else "🟡 Limited" if available > 0 else "🔴 Full"
-        })
-    
-    df = pd.DataFrame(map_data)
+LOTS_PER_PAGE = 10
+DIRECTIONS_URL = "https://www.google.com/maps/dir/?"
+
+# cache_resource returns the same Figure object rather than unpickling (and so
+# re-validating) a copy on every hit; st.plotly_chart only serializes it
+@st.cache_resource(ttl=5, show_spinner=False)
+def build_parking_map(map_df):
+    """Build the campus map figure, shared across reruns with the same plotted data"""
     fig = px.scatter_mapbox(
-        df,
+        map_df,
         lat="Latitude",
         lon="Longitude",
         hover_name="Lot",
@@ -272,8 +385,65 @@ def show_parking_map():
         mapbox_style="open-street-map"
     )
     fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
+    return fig
+
+def show_parking_map(parking_lots):
+    """Interactive campus parking map"""
+    df = pd.DataFrame(parking_lots).rename(columns={"name": "Lot", "capacity": "Capacity", "rate": "Rate"})
+    df["Latitude"] = df["coords"].str[0]
+    df["Longitude"] = df["coords"].str[1]
+    df["Available"] = df["Capacity"] - df["occupied"]
+    df["Status"] = np.select(
+        [df["Available"] > 20, df["Available"] > 0],
+        ["🟢 Good", "🟡 Limited"],
+        "🔴 Full"
+    )
+    
+    # Only pass the plotted columns so unrelated changes don't invalidate the cache
+    fig = build_parking_map(df[["Lot", "Latitude", "Longitude", "Available", "Capacity", "Rate", "Status"]])
     st.plotly_chart(fig, use_container_width=True)
 
+def show_lot_details(lot, available):
+    """Detailed view with spot detection for the selected lot"""
+    with st.container():
+        st.subheader(f"Parking Lot: {lot['name']}")
+        
+        # Display status with color coding
+        status = "Vacant" if available > 0 else "Occupied"
+        status_color = "green" if status == "Vacant" else "red"
+        st.markdown(f"**Status:** <span style='color:{status_color}'>{status}</span>", 
+                   unsafe_allow_html=True)
+        
+        # Display location details
+        st.write(f"**Location:** {lot['location']}")
+        
+        # Parking spot detection
+        st.subheader("Parking Spot Detection")
+        uploaded_file = st.file_uploader("Upload parking spot image", 
+                                       type=["jpg", "jpeg", "png"],
+                                       key=f"upload_{lot['id']}")
+        
+        if uploaded_file is not None:
+            # Classify the parking spot straight from the upload
+            result = classify_upload(uploaded_file)
+            
+            # Display results
+            if result is not None:
+                classification, confidence = result
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.image(uploaded_file, caption="Uploaded Parking Spot", use_column_width=True)
+                with col2:
+                    st.write("### Detection Results")
+                    if classification == "Occupied":
+                        st.error(f"🚗 Occupied ({confidence*100:.1f}% confidence)")
+                    else:
+                        st.success(f"🅿️ Empty ({confidence*100:.1f}% confidence)")
+
+def select_lot(lot_id):
+    """Make lot_id the lot whose details are shown"""
+    st.session_state.selected_lot = lot_id
+
 def parking_lot_card(lot):
     """UI card for each parking lot"""
     available = lot['capacity'] - lot['occupied']
@@ -297,76 +467,41 @@ def parking_lot_card(lot):
         # Action buttons
         btn_col1, btn_col2 = st.columns(2)
         with btn_col1:
-            if st.button("🔍 View Details", key=f"view_{lot['id']}"):
-                st.session_state.selected_lot = lot
-                st.session_state.current_view = "detail"
-                
-                # Show detailed information
-                with st.container():
-                    st.subheader(f"Parking Lot: {lot['name']}")
-                    
-                    # Display status with color coding
-                    status = "Vacant" if available > 0 else "Occupied"
-                    status_color = "green" if status == "Vacant" else "red"
-                    st.markdown(f"**Status:** <span style='color:{status_color}'>{status}</span>", 
-                               unsafe_allow_html=True)
-                    
-                    # Display location details
-                    st.write(f"**Location:** {lot['location']}")
-                    
-                    # Parking spot detection
-                    st.subheader("Parking Spot Detection")
-                    uploaded_file = st.file_uploader("Upload parking spot image", 
-                                                   type=["jpg", "jpeg", "png"],
-                                                   key=f"upload_{lot['id']}")
-                    
-                    if uploaded_file is not None:
-                        # Save the uploaded file
-                        image_path = f"temp_{lot['id']}.jpg"
-                        with open(image_path, "wb") as f:
-                            f.write(uploaded_file.getbuffer())
-                        
-                        # Classify the parking spot
-                        classification, confidence = classify_parking_spot(image_path, model)
-                        
-                        # Display results
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.image(uploaded_file, caption="Uploaded Parking Spot", use_column_width=True)
-                        with col2:
-                            st.write("### Detection Results")
-                            if classification == "Occupied":
-                                st.error(f"🚗 Occupied ({confidence*100:.1f}% confidence)")
-                            else:
-                                st.success(f"🅿️ Empty ({confidence*100:.1f}% confidence)")
-                        
-                        # Clean up
-                        os.remove(image_path)
+            # Select in a callback so it is applied before any card renders its details
+            st.button("🔍 View Details", key=f"view_{lot['id']}",
+                      on_click=select_lot, args=(lot['id'],))
 
         with btn_col2:
-            if st.button("🗺️ Get Directions", key=f"dir_{lot['id']}"):
-                # Generate Google Maps directions URL
-                directions_url = (f"https://www.google.com/maps/dir/?api=1"
-                                f"&origin=Current+Location"
-                                f"&destination={lot['coords'][0]},{lot['coords'][1]}"
-                                f"&travelmode=driving")
-                
-                # Open in new tab
-                st.markdown(f"""
-                <a href="{directions_url}" target="_blank">
-                    <button style="
-                        background-color: #4285F4;
-                        color: white;
-                        padding: 0.5em 1em;
-                        border: none;
-                        border-radius: 4px;
-                        font-size: 1em;
-                        cursor: pointer;
-                    ">
-                        Open in Google Maps
-                    </button>
-                </a>
-                """, unsafe_allow_html=True)
+            # Google Maps directions, opened in a new tab
+            directions_url = DIRECTIONS_URL + urlencode({
+                "api": 1,
+                "origin": "Current Location",
+                "destination": f"{lot['coords'][0]},{lot['coords'][1]}",
+                "travelmode": "driving"
+            }, safe=",")
+            st.link_button("🗺️ Get Directions", directions_url)
+        
+        # Show detailed information for the selected lot only
+        if st.session_state.get("selected_lot") == lot['id']:
+            show_lot_details(lot, available)
+
+@st.fragment
+def _lot_editor(lot):
+    """Admin occupancy editor for one lot, rerun on its own when edited"""
+    new_occupied = st.number_input(
+        "Occupied spots",
+        min_value=0,
+        max_value=lot['capacity'],
+        value=lot['occupied'],
+        key=f"admin_{lot['id']}"
+    )
+    
+    if st.button(f"Update {lot['name']}", key=f"update_{lot['id']}"):
+        if update_parking_status(lot['id'], new_occupied):
+            st.success("Updated successfully!")
+            time.sleep(0.5)
+            # Full app rerun so the other views pick up the new status
+            st.rerun()
 
 # Main App
 def main():
@@ -412,7 +547,7 @@ def main():
     
     if current_view == view_options["map"]:
         st.header("Campus Parking Map")
-        show_parking_map()
+        show_parking_map(parking_lots)
         
     elif current_view == view_options["list"]:
         st.header("All Parking Facilities")
@@ -424,7 +559,13 @@ def main():
             if search.lower() in lot['name'].lower() or search.lower() in lot['location'].lower()
         ]
         
-        for lot in filtered_lots:
+        # Paginate so only one page of cards (and their widgets) is rendered
+        num_pages = max(1, math.ceil(len(filtered_lots) / LOTS_PER_PAGE))
+        if st.session_state.get("parking_page", 1) > num_pages:
+            st.session_state.parking_page = num_pages
+        page = st.number_input("Page", min_value=1, max_value=num_pages, key="parking_page")
+        
+        for lot in filtered_lots[(page - 1) * LOTS_PER_PAGE:page * LOTS_PER_PAGE]:
             parking_lot_card(lot)
 
     elif current_view == view_options["reserve"]:
@@ -489,42 +630,21 @@ def main():
             
             for lot in parking_lots:
                 with st.expander(lot['name']):
-                    new_occupied = st.number_input(
-                        "Occupied spots",
-                        min_value=0,
-                        max_value=lot['capacity'],
-                        value=lot['occupied'],
-                        key=f"admin_{lot['id']}"
-                    )
-                    
-                    if st.button(f"Update {lot['name']}", key=f"update_{lot['id']}"):
-                        if update_parking_status(lot['id'], new_occupied):
-                            st.success("Updated successfully!")
-                            time.sleep(0.5)
-                            st.rerun()
+                    _lot_editor(lot)
         
         with tab2:
             st.subheader("Parking Analytics")
             
             # Data visualization
-            data = []
-            for lot in parking_lots:
-                data.append({
-                    "Lot": lot['name'],
-                    "Capacity": lot['capacity'],
-                    "Occupied": lot['occupied'],
-                    "Utilization": lot['occupied'] / lot['capacity'] * 100
-                })
-            
-            df = pd.DataFrame(data)
+            df, total_capacity, total_occupied = get_analytics()
             
             col1, col2 = st.columns(2)
             with col1:
                 st.bar_chart(df, x="Lot", y=["Capacity", "Occupied"])
             with col2:
-                st.metric("Total Campus Capacity", sum(lot['capacity'] for lot in parking_lots))
-                st.metric("Current Utilization", 
-                         f"{sum(lot['occupied'] for lot in parking_lots)/sum(lot['capacity'] for lot in parking_lots)*100:.1f}%")
+                st.metric("Total Campus Capacity", total_capacity)
+                utilization = total_occupied / total_capacity * 100 if total_capacity else 0
+                st.metric("Current Utilization", f"{utilization:.1f}%")
         
         with tab3:
             st.subheader("Parking Spot Detection")
@@ -536,23 +656,17 @@ def main():
                 # Display the uploaded image
                 st.image(uploaded_file, caption="Uploaded Parking Spot", use_column_width=True)
                 
-                # Save the uploaded file temporarily
-                image_path = "temp_upload.jpg"
-                with open(image_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-                
-                # Classify the parking spot
-                classification, confidence = classify_parking_spot(image_path, model)
+                # Classify the parking spot straight from the upload
+                result = classify_upload(uploaded_file)
                 
                 # Display results
-                st.write("### Detection Results")
-                if classification == "Occupied":
-                    st.error(f"🚗 Occupied ({confidence*100:.1f}% confidence)")
-                else:
-                    st.success(f"🅿️ Empty ({confidence*100:.1f}% confidence)")
-                
-                # Clean up
-                os.remove(image_path)
+                if result is not None:
+                    classification, confidence = result
+                    st.write("### Detection Results")
+                    if classification == "Occupied":
+                        st.error(f"🚗 Occupied ({confidence*100:.1f}% confidence)")
+                    else:
+                        st.success(f"🅿️ Empty ({confidence*100:.1f}% confidence)")
 
     # Footer
     st.markdown("---")